@@ -16,6 +16,11 @@ class ChromeDriverFactory:
     sterownika Selenium Chrome, z opcjami maskującymi i trybem awaryjnym.
     """
 
+    # Ile razy create_driver odczeka RETRY_WAIT_SECONDS przed ponowieniem próby.
+    # Logowanie trzyma blokadę klienta, więc oczekiwanie nie może być nieskończone.
+    MAX_RETRY_WAITS = 5
+    RETRY_WAIT_SECONDS = 60
+
     def __init__(self, headless: bool = False, progress_callback=None):
         """
         Inicjalizuje fabrykę, akceptując i przechowując progress_callback.
@@ -24,15 +29,29 @@ class ChromeDriverFactory:
         # Jeśli callback nie zostanie podany, użyj pustej funkcji lambda
         self.progress_callback = progress_callback or (lambda value, text: None)
         self._fallback_attempted = False
+        # Ścieżka sterownika z WebDriverManagera - ustalana raz na życie fabryki.
+        self._driver_path = None
+
+    def set_progress_callback(self, progress_callback=None):
+        """Podmienia callback postępu bez tworzenia nowej fabryki."""
+        self.progress_callback = progress_callback or (lambda value, text: None)
+
+    def reset(self):
+        """
+        Przywraca stan sprzed logowania (np. flagę trybu awaryjnego),
+        zachowując ustaloną już ścieżkę sterownika.
+        """
+        self._fallback_attempted = False
 
     def create_driver(self) -> webdriver.Chrome:
         """
         Główna metoda tworząca sterownik. W przypadku timeoutu (np. zablokowana sesja),
-        wchodzi w tryb inteligentnego oczekiwania.
+        wchodzi w tryb inteligentnego oczekiwania - najwyżej MAX_RETRY_WAITS razy.
         """
         self.progress_callback(10, "Uruchamianie przeglądarki...")
         logger.info("Tworzenie standardowego sterownika Chrome WebDriver...")
-        while True: # Nieskończona pętla, którą przerwiemy po sukcesie
+        waits = 0
+        while True: # Pętla przerywana po sukcesie lub po wyczerpaniu limitu oczekiwań
             try:
                 logger.info("Tworzenie standardowego sterownika Chrome WebDriver...")
                 options = self._get_chrome_options()
@@ -46,10 +65,7 @@ class ChromeDriverFactory:
                 # Sprawdź, czy błąd to nasz znajomy "Read timed out"
                 if 'Read timed out' in str(e):
                     logger.warning("Nie udało się utworzyć sterownika z powodu timeoutu. Prawdopodobnie sesja Windows jest zablokowana.")
-                    logger.info("Aplikacja wstrzymuje próbę logowania i będzie próbować ponownie co 60 sekund...")
-                    
-                    # Czekaj 60 sekund przed następną próbą
-                    time.sleep(60)
+                    waits = self._wait_before_retry(waits, e)
                     
                     # Kontynuuj pętlę, aby spróbować ponownie
                     continue
@@ -58,6 +74,8 @@ class ChromeDriverFactory:
                     logger.error(f"Nie udało się utworzyć głównego sterownika Chrome: {e}", exc_info=True)
                     if not self._fallback_attempted:
                         self._fallback_attempted = True
+                        # Zapamiętany sterownik mógł się zdezaktualizować (np. po aktualizacji Chrome).
+                        self._driver_path = None
                         logger.warning("Próba utworzenia sterownika w trybie awaryjnym (fallback)...")
                         # W trybie awaryjnym również używamy pętli
                         continue
@@ -66,10 +84,28 @@ class ChromeDriverFactory:
             except Exception as e:
                  # Obsługa innych, nieprzewidzianych błędów
                  logger.error(f"Wystąpił nieoczekiwany błąd podczas tworzenia sterownika: {e}", exc_info=True)
-                 logger.info("Czekam 60 sekund przed ponowieniem próby...")
-                 time.sleep(60)
+                 waits = self._wait_before_retry(waits, e)
                  continue
 
+    def _wait_before_retry(self, waits: int, error: Exception) -> int:
+        """
+        Odczekuje RETRY_WAIT_SECONDS przed kolejną próbą utworzenia sterownika.
+
+        Returns:
+            Zaktualizowana liczba oczekiwań.
+
+        Raises:
+            WebDriverException: Gdy wyczerpano limit MAX_RETRY_WAITS.
+        """
+        if waits >= self.MAX_RETRY_WAITS:
+            raise WebDriverException(
+                f"Nie udało się utworzyć sterownika po {self.MAX_RETRY_WAITS} ponowieniach: {error}"
+            )
+        logger.info(f"Czekam {self.RETRY_WAIT_SECONDS} sekund przed ponowieniem próby "
+                    f"({waits + 1}/{self.MAX_RETRY_WAITS})...")
+        time.sleep(self.RETRY_WAIT_SECONDS)
+        return waits + 1
+
     def _get_chrome_options(self) -> webdriver.ChromeOptions:
         """Zwraca skonfigurowany obiekt ChromeOptions z opcjami maskującymi."""
         options = webdriver.ChromeOptions()
@@ -108,11 +144,12 @@ class ChromeDriverFactory:
     def _get_chrome_service(self) -> Service:
         """Zwraca obiekt Service, zarządzając instalacją sterownika."""
         try:
-            logger.info("Konfiguracja usługi ChromeDriver za pomocą WebDriverManager...")
-            # Wyłączenie weryfikacji SSL, co pomaga w niektórych sieciach firmowych
-            os.environ['WDM_SSL_VERIFY'] = '0'
-            driver_path = ChromeDriverManager().install()
-            return Service(driver_path)
+            if self._driver_path is None:
+                logger.info("Konfiguracja usługi ChromeDriver za pomocą WebDriverManager...")
+                # Wyłączenie weryfikacji SSL, co pomaga w niektórych sieciach firmowych
+                os.environ['WDM_SSL_VERIFY'] = '0'
+                self._driver_path = ChromeDriverManager().install()
+            return Service(self._driver_path)
         except Exception as e:
             logger.error(f"Nie udało się skonfigurować usługi ChromeDriver: {e}")
             raise
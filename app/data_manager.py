@@ -6,6 +6,7 @@ zapis i aktualizację danych dla specjalności, lekarzy i placówek.
 
 import json
 import logging
+import os
 import threading
 from pathlib import Path
 from typing import Dict, List, Any, Optional
@@ -22,6 +23,9 @@ class BaseDataManager:
         self.file_path = file_path
         self.data: Dict[str, Any] = {}
         self._lock = threading.Lock()
+        # Posortowane listy nazw z get_all_names, osobno dla konta dziecka i dorosłego.
+        # Czyszczone przy każdej zmianie danych.
+        self._names_cache: Dict[bool, List[str]] = {}
         self._load_data()
 
     def _load_data(self) -> None:
@@ -29,6 +33,7 @@ class BaseDataManager:
         Wczytuje dane z pliku JSON. Jeśli plik nie istnieje, tworzy go.
         """
         with self._lock:
+            self._names_cache.clear()
             try:
                 if self.file_path.exists():
                     with self.file_path.open('r', encoding='utf-8') as f:
@@ -52,8 +57,12 @@ class BaseDataManager:
         try:
             # Upewnij się, że katalog nadrzędny istnieje
             self.file_path.parent.mkdir(parents=True, exist_ok=True)
-            with self.file_path.open('w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=4, ensure_ascii=False)
+            # Serializacja w pamięci i jeden zapis do pliku tymczasowego,
+            # podmienianego atomowo - przerwany zapis nie uszkodzi bazy.
+            payload = json.dumps(self.data, indent=4, ensure_ascii=False).encode('utf-8')
+            tmp_path = self.file_path.with_suffix('.tmp')
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, self.file_path)
         except Exception as e:
             logger.error(f"Nie udało się zapisać danych do pliku '{self.file_path}': {e}")
             
@@ -74,6 +83,10 @@ class BaseDataManager:
             Przefiltrowana i posortowana lista nazw specjalności.
         """
         with self._lock:
+            cached = self._names_cache.get(is_child_account)
+            if cached is not None:
+                return list(cached)
+
             filtered_specialties: List[str] = []
             for name, details in self.data.items():
                 if is_child_account:
@@ -86,8 +99,10 @@ class BaseDataManager:
                     # oznaczone jako "tylko dla dziecka".
                     if not details.get("for_child_account_only", False):
                         filtered_specialties.append(name)
-            
-            return sorted(filtered_specialties)
+
+            filtered_specialties.sort()
+            self._names_cache[is_child_account] = filtered_specialties
+            return list(filtered_specialties)
 
 class SpecialtyManager(BaseDataManager):
     """
@@ -153,12 +168,13 @@ class DoctorManager(BaseDataManager):
                 changed = True
             else:
                 # Zaktualizuj istniejącego, jeśli trzeba
-                if specialty_id not in entry.get('specialty_ids', []):
+                if specialty_id not in entry.get('specialty_ids', ()):
                     entry['specialty_ids'].append(specialty_id)
                     logger.info(f"Zaktualizowano specjalności dla lekarza: {doctor_name}")
                     changed = True
             
             if changed:
+                self._names_cache.clear()
                 self._save_data_unlocked()
         
         return changed
@@ -166,7 +182,8 @@ class DoctorManager(BaseDataManager):
     def get_id_by_name(self, name: str) -> Optional[str]:
         """Zwraca ID dla podanego lekarza."""
         with self._lock:
-            return self.data.get(name, {}).get('id')
+            entry = self.data.get(name)
+            return entry.get('id') if entry else None
     def get_all_doctors_data(self) -> Dict[str, Any]:
         """
         Zwraca kopię słownika ze wszystkimi danymi lekarzy.
@@ -178,7 +195,7 @@ class DoctorManager(BaseDataManager):
     def get_ids_by_names(self, names: list[str]) -> list[str]:
         """Zwraca listę ID dla podanej listy nazw lekarzy."""
         with self._lock:
-            ids = [self.data.get(name, {}).get('id') for name in names]
+            ids = (entry.get('id') for entry in map(self.data.get, names) if entry)
             return [doc_id for doc_id in ids if doc_id] # Zwróć tylko te, które nie są None
 class ClinicManager(BaseDataManager):
     """
@@ -212,6 +229,7 @@ class ClinicManager(BaseDataManager):
                 changed = True
         
             if changed:
+                self._names_cache.clear()
                 self._save_data_unlocked()
 
         return changed
@@ -219,10 +237,11 @@ class ClinicManager(BaseDataManager):
     def get_id_by_name(self, name: str) -> Optional[str]:
         """Zwraca ID dla podanej placówki."""
         with self._lock:
-            return self.data.get(name, {}).get('id')
+            entry = self.data.get(name)
+            return entry.get('id') if entry else None
             
     def get_ids_by_names(self, names: list[str]) -> list[str]:
         """Zwraca listę ID dla podanej listy nazw placówek."""
         with self._lock:
-            ids = [self.data.get(name, {}).get('id') for name in names]
+            ids = (entry.get('id') for entry in map(self.data.get, names) if entry)
             return [clinic_id for clinic_id in ids if clinic_id] # Zwróć tylko te, które nie są None
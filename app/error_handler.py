@@ -137,20 +137,26 @@ def handle_response_status(response: requests.Response, function_name: str, atte
 
 def log_api_call(func: Callable) -> Callable:
     """Dekorator do logowania wywołań API"""
+    func_name = func.__name__
+    perf_counter = time.perf_counter
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        logger.debug(f"Starting API call: {func.__name__}")
-        start_time = time.time()
+        # Komunikaty DEBUG budujemy tylko wtedy, gdy zostaną faktycznie wypisane.
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            logger.debug("Starting API call: %s", func_name)
+        start_time = perf_counter()
         
         try:
             result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            logger.debug(f"API call {func.__name__} completed in {execution_time:.2f}s")
+            if debug_enabled:
+                logger.debug("API call %s completed in %.2fs", func_name, perf_counter() - start_time)
             return result
         
         except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"API call {func.__name__} failed after {execution_time:.2f}s: {str(e)}")
+            execution_time = perf_counter() - start_time
+            logger.error(f"API call {func_name} failed after {execution_time:.2f}s: {str(e)}")
             raise
     
     return wrapper
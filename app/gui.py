@@ -20,7 +20,7 @@ from pathlib import Path
 import queue
 
 logger = logging.getLogger(__name__)
-from medicover_client import LoginRequiredException
+from medicover_client import LoginRequiredException, SessionRenewalInProgressException
 
 
 class GuiLogHandler(logging.Handler):
@@ -299,6 +299,8 @@ class MedicoverGUI:
         self.countdown_job_id: Optional[str] = None
         self.next_check_time: Optional[datetime] = None
         self.is_quarantined = False
+        # Rezerwacja działa w osobnym wątku - flaga blokuje rozpoczęcie drugiej naraz
+        self._booking_in_progress = False
         # Zmienne dla filtrów
         self.filter_specialty = tk.StringVar()
 
@@ -423,6 +425,7 @@ class MedicoverGUI:
         self.logger.info("Zamykanie aplikacji GUI...")
         self.stop_cyclic_check()
         self._save_gui_settings() # Wywołanie nowej metody zapisu
+        self.app.profile_manager.flush()
         self.root.destroy()
         sys.exit(0)
 
@@ -529,16 +532,17 @@ class MedicoverGUI:
 
         def login_worker():
             try:
-                # Przekaż metodę okna postępu jako callback do logiki klienta
-                self.app.client.config_data['progress_callback'] = progress_win.update_progress
+                # Callback jest wołany z wątku logowania - aktualizację okna
+                # przekazujemy do pętli Tk zamiast dotykać widżetów z tego wątku.
+                self.app.client.config_data['progress_callback'] = (
+                    lambda value, text: self.root.after(0, progress_win.update_progress, value, text)
+                )
                 
-                username = self.app.client.username
-                password = self.app.client.password
-                success = self.app.client.login(username, password)
+                success = self.app.client.login_with_stored_credentials()
                 
                 # Po zakończeniu, ustaw pasek na 100%
                 if success:
-                    progress_win.update_progress(100, "Zalogowano pomyślnie!")
+                    self.root.after(0, progress_win.update_progress, 100, "Zalogowano pomyślnie!")
                     time.sleep(0.5) # Krótka pauza, aby użytkownik zobaczył sukces
                 
                 self.root.after(0, on_login_complete, success)
@@ -1613,6 +1617,10 @@ class MedicoverGUI:
                 # Krok 5: Aktualizacja GUI z wynikami
                 self.root.after(0, self._update_gui_with_appointments, appointments, "Wyszukiwanie API")
 
+            except SessionRenewalInProgressException:
+                # Logowanie w tle już trwa - nie uruchamiamy drugiego.
+                self.logger.info("Sesja jest odnawiana w tle. Pomijam to wyszukiwanie.")
+                self.root.after(0, lambda: self.status_var.set("Trwa odnawianie sesji. Spróbuj ponownie za chwilę."))
             except LoginRequiredException:
                 self.logger.warning("Wymagane ponowne logowanie. Uruchamianie procesu.")
                 self.root.after(0, self._execute_login_with_progress_bar, lambda: self.search_appointments_from_gui(is_background_check))
@@ -1625,11 +1633,29 @@ class MedicoverGUI:
 
     def _perform_autobooking(self, appointment: Dict):
         """Wykonuje rezerwację w tle i aktualizuje stan aplikacji."""
+        if self._booking_in_progress:
+            self.logger.info("Inna rezerwacja jest w toku. Pomijam auto-rezerwację.")
+            return
+        self._booking_in_progress = True
         self.logger.info(f"Znaleziono pasującą wizytę. Próba automatycznej rezerwacji...")
         self.status_var.set("Znaleziono wizytę! Próba rezerwacji...")
-        
-        result = self.app.book_appointment(appointment)
-        
+
+        def worker():
+            # Rezerwacja (wraz z ewentualnym ponownym logowaniem) nie może blokować pętli Tk.
+            try:
+                result = self.app.book_appointment(appointment)
+            except LoginRequiredException as e:
+                result = {"success": False, "error": "login_required", "message": f"Wymagane ponowne logowanie ({e})."}
+            except Exception as e:
+                self.logger.error(f"Błąd auto-rezerwacji: {e}", exc_info=True)
+                result = {"success": False, "error": "unexpected_error", "message": f"Błąd: {e}"}
+            self.root.after(0, self._on_autobooking_complete, appointment, result)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_autobooking_complete(self, appointment: Dict, result: Dict):
+        """Aktualizuje GUI po zakończeniu automatycznej rezerwacji (wątek Tk)."""
+        self._booking_in_progress = False
         if result.get("success"):
             doctor = self.extract_doctor_name(appointment)
             date_str, time_str = self.extract_appointment_data(appointment)
@@ -1739,12 +1765,41 @@ class MedicoverGUI:
                 self.perform_booking(appointment)
 
     def perform_booking(self, appointment: Dict):
-        """Wykonuje faktyczną rezerwację wizyty przez API."""
+        """
+        Wykonuje faktyczną rezerwację wizyty przez API. Samo wywołanie API
+        (i ewentualne ponowne logowanie) działa w osobnym wątku, a wynik
+        wraca do GUI przez root.after - tak jak w search_appointments_from_gui.
+        """
+        if self._booking_in_progress:
+            self.status_var.set("Rezerwacja jest już w toku. Proszę czekać.")
+            return
+        self._booking_in_progress = True
         self.status_var.set("Rezerwowanie wizyty...")
-        self.root.update_idletasks()
-        try:
-            result = self.app.client.book_appointment(appointment)
-            if result.get("success"):
+
+        def worker():
+            try:
+                result = self.app.client.book_appointment(appointment)
+                self.root.after(0, on_booking_complete, result, None)
+            except LoginRequiredException as e:
+                self.root.after(0, on_booking_complete, None, e)
+            except Exception as e:
+                self.logger.error(f"Błąd wykonania rezerwacji: {e}", exc_info=True)
+                self.root.after(0, on_booking_complete, None, e)
+
+        def on_booking_complete(result: Optional[Dict], error: Optional[Exception]):
+            self._booking_in_progress = False
+            if isinstance(error, SessionRenewalInProgressException):
+                self.logger.info("Rezerwacja wstrzymana: sesja jest odnawiana w tle.")
+                messagebox.showwarning("Odnawianie sesji", "Trwa odnawianie sesji. Spróbuj zarezerwować wizytę za chwilę.")
+                self.status_var.set("Trwa odnawianie sesji.")
+            elif isinstance(error, LoginRequiredException):
+                self.logger.info("Wykryto potrzebę ponownego logowania przed rezerwacją.")
+                # Po zalogowaniu, ponów próbę rezerwacji TEJ SAMEJ wizyty
+                self._execute_login_with_progress_bar(lambda: self.perform_booking(appointment))
+            elif error is not None:
+                messagebox.showerror("Błąd krytyczny", f"Nie udało się zarezerwować wizyty:\n{error}")
+                self.status_var.set("Błąd rezerwacji.")
+            elif result.get("success"):
                 messagebox.showinfo("Sukces", result.get("message", "Wizyta została pomyślnie zarezerwowana."))
                 self.status_var.set("Wizyta zarezerwowana.")
                 self.search_appointments_from_gui() 
@@ -1752,14 +1807,8 @@ class MedicoverGUI:
                 error_msg = result.get("message", "Nieznany błąd rezerwacji.")
                 messagebox.showerror("Błąd rezerwacji", error_msg)
                 self.status_var.set(f"Błąd rezerwacji: {result.get('error', 'nieznany')}")
-        except LoginRequiredException:
-            self.logger.info("Wykryto potrzebę ponownego logowania przed rezerwacją.")
-            # Po zalogowaniu, ponów próbę rezerwacji TEJ SAMEJ wizyty
-            self._execute_login_with_progress_bar(lambda: self.perform_booking(appointment))
-        except Exception as e:
-            self.logger.error(f"Błąd wykonania rezerwacji: {e}", exc_info=True)
-            messagebox.showerror("Błąd krytyczny", f"Nie udało się zarezerwować wizyty:\n{e}")
-            self.status_var.set("Błąd rezerwacji.")
+
+        threading.Thread(target=worker, daemon=True).start()
 
     def export_appointments(self):
         """Eksportuje przefiltrowane wizyty do pliku tekstowego."""
@@ -5,6 +5,7 @@ interfejsu graficznego (GUI).
 
 import logging
 import sys
+from functools import partial
 from typing import Optional, List, Dict, Any
 from pathlib import Path
 # Zredukowane, niezbędne importy
@@ -99,10 +100,16 @@ class MedicoverApp:
         self.current_profile = profile_name
         
         config_data_for_client = self.config.data.copy()
-        config_data_for_client['username'], config_data_for_client['password'] = credentials
+        # Hasło nie trafia do konfiguracji klienta - klient pobiera je
+        # z ProfileManagera dopiero w chwili (ponownego) logowania.
+        config_data_for_client['username'] = credentials[0]
+        config_data_for_client.pop('password', None)
         
         try:
-            self.client = MedicoverClient(config_data_for_client)
+            self.client = MedicoverClient(
+                config_data_for_client,
+                credentials_provider=partial(self.profile_manager.get_credentials, profile_name)
+            )
             self.logger.info(f"Pomyślnie przełączono i zainicjalizowano klienta dla profilu: {self.current_profile}")
             return True
         except Exception as e:
@@ -137,28 +144,3 @@ class MedicoverApp:
             self.logger.error("Rezerwacja niemożliwa: klient nie jest zainicjalizowany.")
             return {"success": False, "error": "client_not_initialized", "message": "Klient nie jest gotowy."}
         return self.client.book_appointment(appointment)
-    def run_gui(self):
-        """Tworzy i uruchamia interfejs graficzny."""
-        print("🚀 Uruchamianie interfejsu graficznego...")
-        # Przekazujemy 'self' (czyli całą instancję app) oraz ścieżkę do konfiguracji
-        gui = MedicoverGUI(self, self.config_dir)
-        gui.run()
-def main():
-    """Główna funkcja aplikacji, która inicjalizuje i uruchamia GUI."""
-    try:
-        app = MedicoverApp()
-
-        from gui import MedicoverGUI
-        print("🚀 Uruchamianie interfejsu graficznego...")
-        gui = MedicoverGUI(app)
-        gui.run()
-
-    except KeyboardInterrupt:
-        print("\n🛑 Działanie przerwane przez użytkownika.")
-    except Exception as e:
-        try:
-            logging.getLogger(__name__).error(f"Wystąpił błąd krytyczny: {e}", exc_info=True)
-        except Exception:
-            pass
-        print(f"❌ Błąd krytyczny: {e}")
-        sys.exit(1)
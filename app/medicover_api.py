@@ -157,7 +157,7 @@ class MedicoverAPI:
         if 'StartTime' not in final_api_params:
             final_api_params['StartTime'] = datetime.now().strftime("%Y-%m-%d")
         
-        logger.debug(f"Zbudowano finalne parametry zapytania do API: {final_api_params}")
+        logger.debug("Zbudowano finalne parametry zapytania do API: %s", final_api_params)
         return final_api_params
         
     @handle_api_errors  # ZREFAKTORYZOWANE: używamy dekoratora z error_handler
@@ -174,8 +174,8 @@ class MedicoverAPI:
         params = self._build_request_params(search_params)
         
         logger.info("Searching appointments via API...")
-        logger.debug(f"Request URL: {url}")
-        logger.debug(f"Request params: {params}")
+        logger.debug("Request URL: %s", url)
+        logger.debug("Request params: %s", params)
         
         response = self.session.get(
             url, 
@@ -195,7 +195,7 @@ class MedicoverAPI:
     
     def _process_response(self, response: requests.Response) -> List[Dict[str, Any]]:
         """Przetwarza odpowiedź API"""
-        logger.info(f"API Response status: {response.status_code}")
+        logger.info("API Response status: %s", response.status_code)
         
         if response.status_code != 200:
             logger.error(f"API returned status: {response.status_code}")
@@ -226,7 +226,7 @@ class MedicoverAPI:
                 logger.error(f"Appointments data is not a list: {type(appointments)}")
                 return []
             
-            logger.info(f"Found {len(appointments)} appointments")
+            logger.info("Found %d appointments", len(appointments))
             
             # Loguj dodatkowe informacje z response
             if logger.isEnabledFor(logging.DEBUG):
@@ -294,8 +294,8 @@ class MedicoverAPI:
         }
         
         logger.info(f"Booking appointment with bookingString: {booking_string[:50]}...")
-        logger.debug(f"Request URL: {url}")
-        logger.debug(f"Request payload: {payload}")
+        logger.debug("Request URL: %s", url)
+        logger.debug("Request payload: %s", payload)
         
         headers = {"Content-Type": "application/json"}
         
@@ -31,8 +31,14 @@ class MedicoverAuthenticator:
         )
         self.auth_info: Dict = {'login_attempts': 0}
 
+    def set_progress_callback(self, progress_callback=None):
+        """Ustawia callback postępu dla kolejnego logowania (także w fabryce sterownika)."""
+        self.progress_callback = progress_callback or (lambda value, text: None)
+        self.driver_factory.set_progress_callback(self.progress_callback)
+
     def login(self, username: str, password: str) -> Optional[str]:
         self.auth_info['login_attempts'] += 1
+        self.driver_factory.reset()
         logger.info(f"Rozpoczynanie próby logowania #{self.auth_info['login_attempts']}...")
         
         driver = None
@@ -4,19 +4,23 @@ która zarządza stanem sesji i koordynuje pracę wyspecjalizowanych komponentó
 """
 
 import logging
-from typing import Dict, List, Any, Optional
-from datetime import datetime, timedelta
+import threading
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
+from datetime import datetime
 
 from medicover_api import MedicoverAPI
 from medicover_authenticator import MedicoverAuthenticator
 from appointment_formatter import AppointmentFormatter
 from error_handler import AuthenticationException, RateLimitException
 
-logger = logging.getLogger(__name__)
-
 class LoginRequiredException(Exception):
     """Sygnalizuje, że operacja wymaga ponownego zalogowania."""
     pass
+
+class SessionRenewalInProgressException(LoginRequiredException):
+    """Sygnalizuje, że sesja jest właśnie odnawiana w innym wątku - wystarczy ponowić operację później."""
+    pass
     
 class MedicoverClient:
     """
@@ -24,33 +28,52 @@ class MedicoverClient:
     zadania do authenticatora i klienta API, oraz implementuje wysokopoziomową
     logikę ponawiania prób w przypadku wygaśnięcia tokenu.
     """
+
+    # Po tym czasie token uznajemy za wygasły bez odpytywania API.
+    TOKEN_MAX_AGE_SECONDS = 45 * 60
     
-    def __init__(self, config_data: Dict[str, Any]):
+    def __init__(self, config_data: Dict[str, Any],
+                 credentials_provider: Optional[Callable[[], Optional[Tuple[str, str]]]] = None):
         """
         Inicjalizuje klienta i jego komponenty.
 
         Args:
             config_data: Słownik z danymi konfiguracyjnymi, w tym 'username',
                          'password' i 'headless'.
+            credentials_provider: Opcjonalna funkcja zwracająca (login, hasło)
+                         w chwili logowania, np. ProfileManager.get_credentials.
+                         Gdy jest podana, klient nie przechowuje hasła w pamięci.
         """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.config_data = config_data
-        is_headless = config_data.get('headless', False)
+        self._headless: bool = bool(config_data.get('headless', False))
+        # Bazowe parametry wyszukiwania budujemy raz; MedicoverAPI pracuje na
+        # własnej kopii, więc ten słownik nie może być modyfikowany w miejscu.
+        self._base_search_params: Dict[str, Any] = dict(config_data.get('search_params', {}))
         
         # --- Delegacja do wyspecjalizowanych komponentów ---
-        self.authenticator = MedicoverAuthenticator(headless=is_headless)
+        self.authenticator = MedicoverAuthenticator(headless=self._headless)
         self.api = MedicoverAPI()
         self.formatter = AppointmentFormatter()
         
         # --- Zarządzanie stanem sesji ---
         self.current_token: Optional[str] = None
         
-        # KLUCZOWA ZMIANA: Od razu zapisujemy dane logowania przy tworzeniu obiektu.
-        # To jest niezbędne dla działania ponownego logowania po zmianie profilu.
+        # Dane logowania do ponownego logowania w tle. Hasło trzymamy w pamięci
+        # tylko wtedy, gdy nie ma dostawcy, który poda je na żądanie.
+        self._credentials_provider = credentials_provider
         self.username: Optional[str] = config_data.get('username')
-        self.password: Optional[str] = config_data.get('password')
+        self.password: Optional[str] = None if credentials_provider else config_data.get('password')
         
         self.token_set_time: Optional[datetime] = None
+        # Zegar monotoniczny do wyliczania wieku tokenu - tańszy niż arytmetyka
+        # na datetime i odporny na zmiany czasu systemowego.
+        self._token_set_mono: Optional[float] = None
+        self._token_expires_mono: Optional[float] = None
+        # Gwarantuje, że naraz trwa tylko jedno logowanie (z GUI lub w tle) -
+        # authenticator i fabryka sterownika są współdzielone między wywołaniami.
+        # RLock, bo _perform_relogin wywołuje login() już z założoną blokadą.
+        self._relogin_lock = threading.RLock()
 
     def login(self, username: str, password: str) -> bool:
         """
@@ -58,46 +81,63 @@ class MedicoverClient:
         Używa danych przekazanych w argumentach, a nie tych z konstruktora,
         aby umożliwić logowanie na inne dane w razie potrzeby.
         """
-        progress_callback = self.config_data.get('progress_callback')
-        try:
-            self.authenticator = MedicoverAuthenticator(
-                headless=self.config_data.get('headless', False),
-                progress_callback=progress_callback
-            )
-            self.logger.info(f"Rozpoczynanie procesu logowania dla użytkownika {username}...")
-            token = self.authenticator.login(username, password)
-            if not token:
-                self.logger.error("Uwierzytelnianie nie powiodło się: nie otrzymano tokenu.")
-                return False
+        # Całe logowanie pod blokadą: równoległe logowanie z GUI i w tle
+        # podmieniałoby sobie callback i stan współdzielonej fabryki sterownika.
+        with self._relogin_lock:
+            # Callback postępu jest wstrzykiwany przez GUI tuż przed logowaniem,
+            # dlatego w odróżnieniu od 'headless' odczytujemy go przy każdym wywołaniu.
+            progress_callback = self.config_data.get('progress_callback')
+            try:
+                # Authenticator (i jego fabryka sterownika) jest używany ponownie -
+                # podmieniamy tylko callback zamiast budować nową instancję.
+                self.authenticator.set_progress_callback(progress_callback)
+                self.logger.info(f"Rozpoczynanie procesu logowania dla użytkownika {username}...")
+                token = self.authenticator.login(username, password)
+                if not token:
+                    self.logger.error("Uwierzytelnianie nie powiodło się: nie otrzymano tokenu.")
+                    return False
 
-            if not self.api.set_bearer_token(token):
-                self.logger.error("Nie udało się ustawić tokenu Bearer w kliencie API.")
-                return False
+                if not self.api.set_bearer_token(token):
+                    self.logger.error("Nie udało się ustawić tokenu Bearer w kliencie API.")
+                    return False
             
-            # Zapisanie stanu sesji po udanym logowaniu
-            self.current_token = token
-            # Nadpisujemy dane, aby były zgodne z ostatnim udanym logowaniem
-            self.username = username
-            self.password = password
-            self.token_set_time = datetime.now()
+                # Zapisanie stanu sesji po udanym logowaniu
+                self.current_token = token
+                # Nadpisujemy dane, aby były zgodne z ostatnim udanym logowaniem
+                self.username = username
+                if self._credentials_provider is None:
+                    self.password = password
+                self.token_set_time = datetime.now()
+                self._token_set_mono = time.monotonic()
+                self._token_expires_mono = self._token_set_mono + self.TOKEN_MAX_AGE_SECONDS
             
-            self.logger.info("Logowanie zakończone sukcesem.")
-            return True
-        except Exception as e:
-            self.logger.error(f"Wystąpił krytyczny błąd podczas logowania: {e}", exc_info=True)
-            return False
+                self.logger.info("Logowanie zakończone sukcesem.")
+                return True
+            except Exception as e:
+                self.logger.error(f"Wystąpił krytyczny błąd podczas logowania: {e}", exc_info=True)
+                return False
 
-    def is_logged_in(self) -> bool:
-        """Sprawdza, czy sesja jest aktywna na podstawie obecności i wieku tokenu."""
-        if not self.current_token:
+    def is_logged_in(self, now: Optional[float] = None) -> bool:
+        """
+        Sprawdza, czy sesja jest aktywna na podstawie obecności i wieku tokenu.
+
+        Args:
+            now: Opcjonalny, już odczytany `time.monotonic()` - pozwala wywołującemu
+                 użyć jednego odczytu zegara dla kilku obliczeń.
+        """
+        token, expires_mono = self.current_token, self._token_expires_mono
+        if not token:
             return False
-        
+
         # Proste sprawdzenie wieku tokenu, aby uniknąć niepotrzebnych wywołań API.
-        if self.token_set_time and (datetime.now() - self.token_set_time > timedelta(minutes=45)):
+        if expires_mono is not None and (now or time.monotonic()) > expires_mono:
             self.logger.info("Token sesji prawdopodobnie wygasł z powodu upływu czasu.")
-            self._clear_token_state()
+            # Czyścimy tylko ten token, który sprawdzaliśmy - jeśli w międzyczasie
+            # inny wątek zalogował się ponownie, nie nadpisujemy świeżego tokenu.
+            if self.current_token is token:
+                self._clear_token_state()
             return False
-        
+
         return True
 
     def search_appointments(self, search_params: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
@@ -105,19 +145,21 @@ class MedicoverClient:
         Wyszukuje wizyty. W przypadku błędu 429 (RateLimitException),
         natychmiast zwraca None, bez czekania.
         """
-        final_params = self.config_data.get('search_params', {}).copy()
         if search_params:
+            final_params = {**self._base_search_params, **search_params}
             # Poprawka: Jeśli przekazujemy nowe SpecialtyIds, usuń stare specialty_ids
-            if 'SpecialtyIds' in search_params:
+            if 'SpecialtyIds' in search_params and 'specialty_ids' not in search_params:
                 final_params.pop('specialty_ids', None)
-            final_params.update(search_params)
+        else:
+            final_params = self._base_search_params
 
         max_retries = 1
         for attempt in range(max_retries + 1):
+            used_token = None
             try:
-                if not self.is_logged_in():
-                    # Jeśli nie jesteśmy zalogowani, od razu rzuć wyjątek do GUI
-                    raise LoginRequiredException("Sesja wygasła lub nie została zainicjowana.")
+                # Bez sesji (lub w trakcie jej odnawiania) wyjątek od razu trafia do GUI
+                self._ensure_session()
+                used_token = self.current_token
                 
                 try:
                     # Główna próba wywołania API
@@ -131,8 +173,7 @@ class MedicoverClient:
                 # POPRAWIONA LOGIKA: Token wygasł, próbujemy się zalogować w tle.
                 self.logger.warning(f"Błąd uwierzytelnienia (próba {attempt + 1}): {e}. Próba ponownego logowania...")
                 if attempt < max_retries:
-                    self._clear_token_state()
-                    if self._perform_relogin():
+                    if self._perform_relogin(stale_token=used_token):
                         self.logger.info("Ponowne logowanie w tle udane. Ponawiam zapytanie do API...")
                         continue  # Wróć na początek pętli i spróbuj ponownie
                     else:
@@ -159,9 +200,10 @@ class MedicoverClient:
 
         max_retries = 1
         for attempt in range(max_retries + 1):
+            used_token = None
             try:
-                if not self.is_logged_in():
-                    raise LoginRequiredException("Sesja wygasła lub nie została zainicjowana.")
+                self._ensure_session()
+                used_token = self.current_token
                 
                 return self.api.book_appointment(booking_string)
                 
@@ -169,8 +211,7 @@ class MedicoverClient:
                 # POPRAWIONA LOGIKA: Token wygasł, próbujemy się zalogować w tle.
                 self.logger.warning(f"Błąd uwierzytelnienia podczas rezerwacji (próba {attempt + 1}): {e}. Próba ponownego logowania...")
                 if attempt < max_retries:
-                    self._clear_token_state()
-                    if self._perform_relogin():
+                    if self._perform_relogin(stale_token=used_token):
                         self.logger.info("Ponowne uwierzytelnienie udane. Ponawianie rezerwacji...")
                         continue # Wróć na początek pętli i spróbuj ponownie
                     else:
@@ -187,25 +228,83 @@ class MedicoverClient:
 
         return {"success": False, "error": "authentication_failed", "message": "Rezerwacja nie powiodła się z powodu błędu uwierzytelnienia."}
 
+    def _ensure_session(self) -> None:
+        """
+        Sprawdza, czy jest ważny token ustawiony w kliencie API.
+
+        Nigdy nie czeka na blokadę logowania - metoda bywa wywoływana z wątku GUI,
+        a logowanie przez przeglądarkę trwa wiele sekund. Token, który API
+        odrzuciło (po 401 API czyści nagłówek), nie jest ustawiany ponownie.
+
+        Raises:
+            SessionRenewalInProgressException: Gdy inny wątek właśnie się loguje.
+            LoginRequiredException: Gdy brak sesji i nikt się nie loguje.
+        """
+        if self.is_logged_in() and self.api.bearer_token:
+            return
+
+        if not self._relogin_lock.acquire(blocking=False):
+            raise SessionRenewalInProgressException("Trwa odnawianie sesji.")
+        self._relogin_lock.release()
+        raise LoginRequiredException("Sesja wygasła lub nie została zainicjowana.")
+
     def _clear_token_state(self) -> None:
         """Scentralizowana metoda do czyszczenia stanu tokenu."""
         self.logger.debug("Czyszczenie stanu tokenu sesji.")
         self.current_token = None
         self.token_set_time = None
+        self._token_set_mono = None
+        self._token_expires_mono = None
         self.api.clear_token()
 
-    def _perform_relogin(self) -> bool:
+    def _perform_relogin(self, stale_token: Optional[str] = None) -> bool:
         """
         Prywatna metoda do wykonania ponownego logowania w tle.
         Używa danych logowania przechowywanych w instancji klienta.
+
+        Logowanie wykonuje naraz tylko jeden wątek. Wątki czekające na blokadę
+        sprawdzają, czy token odrzucony przez API (`stale_token`) został już
+        w międzyczasie odnowiony - wtedy korzystają z nowego tokenu zamiast
+        ponownie uruchamiać przeglądarkę.
         """
-        self.logger.info("Próba wykonania ponownego logowania w tle...")
-        if not self.username or not self.password:
-            self.logger.error("Brak zapisanych danych logowania do ponownego uwierzytelnienia.")
+        with self._relogin_lock:
+            current = self.current_token
+            if current and current != stale_token and self.is_logged_in():
+                self.logger.info("Sesja została już odnowiona przez inny wątek. Używam nowego tokenu.")
+                # API mogło wyczyścić nagłówek po 401 na starym tokenie.
+                if self.api.bearer_token != current:
+                    self.api.set_bearer_token(current)
+                return True
+
+            # Odrzucony token zostaje do czasu, aż login() go podmieni. Wątki
+            # rozpoczynające w tym czasie zapytanie dostają od _ensure_session
+            # SessionRenewalInProgressException zamiast czekać na blokadę.
+            self.logger.info("Próba wykonania ponownego logowania w tle...")
+            if self.login_with_stored_credentials():
+                return True
+
+            self._clear_token_state()
             return False
-        
-        # Wywołaj główną metodę logowania z zapisanymi danymi
-        return self.login(self.username, self.password)
+
+    def login_with_stored_credentials(self) -> bool:
+        """
+        Loguje użytkownika danymi od dostawcy (jeśli został podany)
+        lub danymi zapisanymi w instancji klienta.
+        """
+        if self._credentials_provider is not None:
+            credentials = self._credentials_provider()
+        elif self.username and self.password:
+            credentials = (self.username, self.password)
+        else:
+            credentials = None
+
+        if not credentials:
+            self.logger.error("Brak zapisanych danych logowania do uwierzytelnienia.")
+            return False
+
+        # Wywołaj główną metodę logowania z pobranymi danymi
+        return self.login(*credentials)
+
     def close(self):
         """Zamyka przeglądarkę zarządzaną przez authenticator."""
         self.logger.info("Zamykanie zasobów klienta (przeglądarka)...")
@@ -217,13 +316,19 @@ class MedicoverClient:
 
     def get_session_info(self) -> Dict[str, Any]:
         """Zbiera i zwraca informacje diagnostyczne o sesji."""
+        # Migawka stanu sesji na początku - dalsze obliczenia operują na kopiach,
+        # więc logowanie w innym wątku nie rozspójni zwracanego raportu.
+        token, token_set_mono = self.current_token, self._token_set_mono
+        now = time.monotonic()
+        logged_in = self.is_logged_in(now)
+
         token_age = None
-        if self.token_set_time:
-            token_age = int((datetime.now() - self.token_set_time).total_seconds())
+        if token_set_mono is not None:
+            token_age = int(now - token_set_mono)
 
         return {
-            "is_logged_in": self.is_logged_in(),
-            "has_bearer_token": bool(self.current_token),
+            "is_logged_in": logged_in,
+            "has_bearer_token": bool(token),
             "token_age_seconds": token_age,
             "authenticator_info": self.authenticator.get_auth_info(),
             "api_session_info": self.api.get_session_info()
@@ -1,16 +1,38 @@
 # app/profile_manager.py
 
+import atexit
 import json
 import os
 import logging
 import base64
 import hashlib
+import threading
+import time
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from cryptography.fernet import Fernet
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # orjson jest opcjonalny - bez niego używamy modułu json
+    orjson = None
+
+
+def _dumps_profiles(data: Dict) -> bytes:
+    """Serializuje dane profili do UTF-8 (orjson, jeśli jest dostępny)."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _loads_profiles(raw: bytes):
+    """Parsuje zawartość pliku profili (orjson, jeśli jest dostępny)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
 # Dataclass UserProfile pozostaje bez zmian
 @dataclass
 class UserProfile:
@@ -23,7 +45,8 @@ class UserProfile:
     last_used: str = ""
 
     def to_dict(self) -> Dict:
-        return asdict(self)
+        # Wszystkie pola są płaskie (str/bool) - kopia __dict__ wystarcza zamiast asdict().
+        return dict(self.__dict__)
 
     @classmethod
     def from_dict(cls, data: Dict) -> 'UserProfile':
@@ -32,6 +55,13 @@ class UserProfile:
 
 class ProfileManager:
 
+    # Minimalny odstęp (w sekundach) między zapisami wywołanymi wyłącznie
+    # aktualizacją `last_used` w get_credentials.
+    LAST_USED_FLUSH_INTERVAL = 30.0
+
+    # Początek każdego tokenu Fernet (base64 bajtu wersji 0x80 i znacznika czasu).
+    _FERNET_TOKEN_PREFIX = "gAAAAA"
+
     def __init__(self, config_dir: Path):
         """
         Inicjalizuje menedżera profili. Wersja ujednolicona i poprawiona.
@@ -45,6 +75,19 @@ class ProfileManager:
         
         # POPRAWKA: Ujednolicenie nazwy listy profili
         self._profiles: List[UserProfile] = []
+        # Indeks profili po nazwie użytkownika - get_profile bez przeszukiwania listy.
+        self._by_username: Dict[str, UserProfile] = {}
+
+        # Niezapisane zmiany `last_used` - utrwalane co LAST_USED_FLUSH_INTERVAL
+        # lub jawnie przez flush().
+        self._dirty = False
+        self._last_flush_mono = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+        # Blokada chroni listę profili, indeks i zapis pliku - flush() może
+        # zostać wywołany z wątku timera lub atexit równolegle z GUI.
+        self._lock = threading.RLock()
+        # Odłożone zmiany trafiają na dysk także przy zamknięciu interpretera.
+        atexit.register(self.flush)
         
         # POPRAWKA: Użycie poprawnej, ujednoliconej metody do wczytywania klucza
         self.key = self._generate_or_load_key()
@@ -80,80 +123,124 @@ class ProfileManager:
             return key
 
     def _encrypt_password(self, password: str) -> str:
-        """Szyfruje hasło."""
-        # POPRAWKA: Użycie `self.cipher`
-        encrypted = self.cipher.encrypt(password.encode('utf-8'))
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        """Szyfruje hasło. Token Fernet jest już tekstem base64 (URL-safe)."""
+        return self.cipher.encrypt(password.encode('utf-8')).decode('ascii')
 
     def _decrypt_password(self, encrypted_password: str) -> str:
         """Deszyfruje hasło."""
         try:
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_password.encode('utf-8'))
-            # POPRAWKA: Użycie `self.cipher`
-            decrypted = self.cipher.decrypt(encrypted_bytes)
-            return decrypted.decode('utf-8')
+            return self.cipher.decrypt(encrypted_password.encode('ascii')).decode('utf-8')
         except Exception as e:
             self.logger.error(f"Błąd deszyfrowania hasła: {e}")
             raise ValueError("Password decryption failed")
 
+    def _migrate_legacy_passwords(self) -> int:
+        """
+        Zdejmuje dodatkową warstwę base64 z haseł zapisanych przez starsze wersje.
+
+        Token Fernet zawsze zaczyna się od "gAAAAA" (bajt wersji 0x80), więc
+        każda inna wartość to stary format base64(token). Migracja nie wymaga
+        deszyfrowania - wystarczy jedno dekodowanie base64.
+
+        Returns:
+            Liczba zmigrowanych profili.
+        """
+        migrated = 0
+        for profile in self._profiles:
+            if profile.password and not profile.password.startswith(self._FERNET_TOKEN_PREFIX):
+                try:
+                    profile.password = base64.urlsafe_b64decode(profile.password.encode('ascii')).decode('ascii')
+                    migrated += 1
+                except Exception as e:
+                    self.logger.error(f"Nie udało się zmigrować hasła profilu '{profile.username}': {e}")
+        return migrated
+
     def load_profiles(self) -> bool:
         """Wczytuje profile z pliku JSON."""
-        # POPRAWKA: Użycie `self.profiles_path`
-        if not self.profiles_path.exists():
-            self.logger.info(f"Plik profili {self.profiles_path} nie istnieje, start z pustą listą.")
-            self._profiles = []
-            return True
-
-        try:
+        with self._lock:
             # POPRAWKA: Użycie `self.profiles_path`
-            with open(self.profiles_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            if not self.profiles_path.exists():
+                self.logger.info(f"Plik profili {self.profiles_path} nie istnieje, start z pustą listą.")
+                self._profiles = []
+                self._rebuild_index()
+                return True
+
+            try:
+                data = _loads_profiles(self.profiles_path.read_bytes())
             
-            profiles_data = data if isinstance(data, list) else data.get('profiles', [])
+                profiles_data = data if isinstance(data, list) else data.get('profiles', [])
             
-            self._profiles = [UserProfile.from_dict(p_data) for p_data in profiles_data]
-            self.logger.info(f"Wczytano {len(self._profiles)} profili.")
-            self._validate_profiles()
-            return True
+                self._profiles = [UserProfile.from_dict(p_data) for p_data in profiles_data]
+                self._rebuild_index()
+                self.logger.info(f"Wczytano {len(self._profiles)} profili.")
+                self._validate_profiles()
+
+                migrated = self._migrate_legacy_passwords()
+                if migrated:
+                    self.logger.info(f"Zmigrowano format zaszyfrowanych haseł dla {migrated} profili.")
+                    self.save_profiles()
+                return True
             
-        except Exception as e:
-            self.logger.error(f"Nie udało się wczytać profili z {self.profiles_path}: {e}")
-            self._profiles = []
-            return False
+            except Exception as e:
+                self.logger.error(f"Nie udało się wczytać profili z {self.profiles_path}: {e}")
+                self._profiles = []
+                self._rebuild_index()
+                return False
 
     def save_profiles(self) -> bool:
         """Zapisuje profile do pliku JSON."""
-        try:
-            self._validate_profiles()
+        with self._lock:
+            try:
+                self._validate_profiles()
             
-            data = {
-                "profiles": [profile.to_dict() for profile in self._profiles],
-                "metadata": { "last_updated": datetime.now().isoformat() }
-            }
+                data = {
+                    "profiles": [profile.to_dict() for profile in self._profiles],
+                    "metadata": { "last_updated": datetime.now().isoformat() }
+                }
             
-            # POPRAWKA: Użycie `self.profiles_path`
-            with open(self.profiles_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            os.chmod(self.profiles_path, 0o600)
-            self.logger.info(f"Zapisano {len(self._profiles)} profili do {self.profiles_path}")
-            return True
+                # Zapis atomowy: plik tymczasowy + os.replace, aby przerwany zapis
+                # nie zostawił uszkodzonego profiles.json.
+                tmp_path = self.profiles_path.with_suffix('.tmp')
+                tmp_path.write_bytes(_dumps_profiles(data))
+                os.chmod(tmp_path, 0o600)
+                os.replace(tmp_path, self.profiles_path)
+
+                self._dirty = False
+                self._last_flush_mono = time.monotonic()
+                self.logger.info(f"Zapisano {len(self._profiles)} profili do {self.profiles_path}")
+                return True
             
-        except Exception as e:
-            self.logger.error(f"Nie udało się zapisać profili do {self.profiles_path}: {e}")
-            return False
+            except Exception as e:
+                self.logger.error(f"Nie udało się zapisać profili do {self.profiles_path}: {e}")
+                return False
+
+    def _rebuild_index(self) -> None:
+        """Odbudowuje indeks po nazwie użytkownika; przy duplikatach wygrywa pierwszy profil."""
+        index: Dict[str, UserProfile] = {}
+        for profile in self._profiles:
+            index.setdefault(profile.username, profile)
+        self._by_username = index
 
-    # Metoda _validate_profiles pozostaje bez zmian
     def _validate_profiles(self) -> None:
-        usernames = [p.username for p in self._profiles]
-        if len(usernames) != len(set(usernames)):
+        # Jedno przejście: duplikaty nazw i liczba profili domyślnych.
+        seen = set()
+        has_duplicates = False
+        default_count = 0
+        for p in self._profiles:
+            if p.username in seen:
+                has_duplicates = True
+            else:
+                seen.add(p.username)
+            if p.default:
+                default_count += 1
+
+        if has_duplicates:
             self.logger.warning("Znaleziono zduplikowane nazwy użytkowników. To może prowadzić do problemów.")
         
-        default_profiles = [p for p in self._profiles if p.default]
-        if len(self._profiles) > 0 and len(default_profiles) == 0:
+        if len(self._profiles) > 0 and default_count == 0:
             self._profiles[0].default = True
             self.logger.info("Nie znaleziono domyślnego profilu, ustawiono pierwszy z listy jako domyślny.")
-        elif len(default_profiles) > 1:
+        elif default_count > 1:
             for i, profile in enumerate(self._profiles):
                 profile.default = (i == 0)
             self.logger.warning("Znaleziono wiele domyślnych profili, zachowano tylko pierwszy.")
@@ -164,39 +251,43 @@ class ProfileManager:
     # _encrypt/_decrypt i save_profiles. Poniżej ich czyste wersje.
 
     def add_profile(self, username: str, password: str, description: str = "", is_child_account: bool = False, set_as_default: bool = False) -> bool:
-        if any(p.username == username for p in self._profiles):
-            self.logger.error(f"Profil o nazwie '{username}' już istnieje.")
-            return False
+        with self._lock:
+            if username in self._by_username:
+                self.logger.error(f"Profil o nazwie '{username}' już istnieje.")
+                return False
         
-        encrypted_password = self._encrypt_password(password)
+            encrypted_password = self._encrypt_password(password)
         
-        if set_as_default:
-            for p in self._profiles:
-                p.default = False
+            if set_as_default:
+                for p in self._profiles:
+                    p.default = False
         
-        profile = UserProfile(
-            username=username, password=encrypted_password, description=description,
-            is_child_account=is_child_account, default=set_as_default or not self._profiles,
-            created=datetime.now().isoformat()
-        )
-        self._profiles.append(profile)
-        return self.save_profiles()
+            profile = UserProfile(
+                username=username, password=encrypted_password, description=description,
+                is_child_account=is_child_account, default=set_as_default or not self._profiles,
+                created=datetime.now().isoformat()
+            )
+            self._profiles.append(profile)
+            self._by_username[username] = profile
+            return self.save_profiles()
 
     def remove_profile(self, username: str) -> bool:
-        profile_to_remove = self.get_profile(username)
-        if not profile_to_remove:
-            return False
+        with self._lock:
+            profile_to_remove = self.get_profile(username)
+            if not profile_to_remove:
+                return False
         
-        was_default = profile_to_remove.default
-        self._profiles = [p for p in self._profiles if p.username != username]
+            was_default = profile_to_remove.default
+            self._profiles = [p for p in self._profiles if p.username != username]
+            del self._by_username[username]
         
-        if was_default and self._profiles:
-            self._profiles[0].default = True
+            if was_default and self._profiles:
+                self._profiles[0].default = True
             
-        return self.save_profiles()
+            return self.save_profiles()
 
     def get_profile(self, username: str) -> Optional[UserProfile]:
-        return next((p for p in self._profiles if p.username == username), None)
+        return self._by_username.get(username)
 
     def get_all_profiles(self) -> List[UserProfile]:
         return self._profiles.copy()
@@ -205,42 +296,65 @@ class ProfileManager:
         return next((p for p in self._profiles if p.default), None)
 
     def set_default_profile(self, username: str) -> bool:
-        profile = self.get_profile(username)
-        if not profile:
-            return False
+        with self._lock:
+            profile = self.get_profile(username)
+            if not profile:
+                return False
         
-        for p in self._profiles:
-            p.default = False
-        profile.default = True
-        return self.save_profiles()
+            for p in self._profiles:
+                p.default = False
+            profile.default = True
+            return self.save_profiles()
 
     def get_credentials(self, username: str) -> Optional[Tuple[str, str]]:
-        try:
-            profile = self.get_profile(username)
-            if not profile:
-                return None
+        with self._lock:
+            try:
+                profile = self.get_profile(username)
+                if not profile:
+                    return None
             
-            decrypted_password = self._decrypt_password(profile.password)
-            profile.last_used = datetime.now().isoformat()
-            self.save_profiles() # Zapisz zaktualizowaną datę ostatniego użycia
-            return (username, decrypted_password)
-        except Exception as e:
-            self.logger.error(f"Nie udało się pobrać danych dla {username}: {e}")
-            return None
+                decrypted_password = self._decrypt_password(profile.password)
+                profile.last_used = datetime.now().isoformat()
+                self._dirty = True
+                # Sama data ostatniego użycia nie jest warta zapisu przy każdym wywołaniu.
+                if time.monotonic() - self._last_flush_mono > self.LAST_USED_FLUSH_INTERVAL:
+                    self.save_profiles()
+                else:
+                    self._schedule_flush()
+                return (username, decrypted_password)
+            except Exception as e:
+                self.logger.error(f"Nie udało się pobrać danych dla {username}: {e}")
+                return None
 
     def update_profile(self, username: str, new_password: Optional[str] = None, new_description: Optional[str] = None, is_child_account: Optional[bool] = None) -> bool:
-        profile = self.get_profile(username)
-        if not profile:
-            return False
+        with self._lock:
+            profile = self.get_profile(username)
+            if not profile:
+                return False
         
-        if new_password:
-            profile.password = self._encrypt_password(new_password)
-        if new_description is not None:
-            profile.description = new_description
-        if is_child_account is not None:
-            profile.is_child_account = is_child_account
+            if new_password:
+                profile.password = self._encrypt_password(new_password)
+            if new_description is not None:
+                profile.description = new_description
+            if is_child_account is not None:
+                profile.is_child_account = is_child_account
             
-        return self.save_profiles()
+            return self.save_profiles()
 
     def has_profiles(self) -> bool:
-        return len(self._profiles) > 0
\ No newline at end of file
+        return len(self._profiles) > 0
+
+    def _schedule_flush(self) -> None:
+        """Planuje zapis w tle po LAST_USED_FLUSH_INTERVAL, jeśli żaden jeszcze nie czeka."""
+        if self._flush_timer is not None and self._flush_timer.is_alive():
+            return
+        self._flush_timer = threading.Timer(self.LAST_USED_FLUSH_INTERVAL, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self) -> bool:
+        """Zapisuje odłożone zmiany (np. `last_used`), jeśli takie istnieją."""
+        with self._lock:
+            if not self._dirty:
+                return True
+            return self.save_profiles()
\ No newline at end of file
@@ -78,11 +78,11 @@ class MedifinderScheduler:
             elapsed = datetime.utcnow() - start_time
             
             if elapsed.total_seconds() >= 24 * 3600:  # 24 godziny
-                logger.info(f"{task_id} ⏰ Automatyczne zatrzymanie po 24 godzinach pracy")
+                logger.info("%s ⏰ Automatyczne zatrzymanie po 24 godzinach pracy", task_id)
                 self.stop_task(user_email, profile)
                 return
         
-        logger.info(f"{task_id} Rozpoczynam cykliczne sprawdzanie...")
+        logger.info("%s Rozpoczynam cykliczne sprawdzanie...", task_id)
         
         try:
             config = self.active_tasks.get(task_id, {})
@@ -108,7 +108,7 @@ class MedifinderScheduler:
                     'appointments': results
                 }
             
-            logger.info(f"{task_id} Znaleziono {len(results)} wizyt")
+            logger.info("%s Znaleziono %d wizyt", task_id, len(results))
             
             # Auto-booking jeśli włączone
             if config.get('auto_book', False) and len(results) > 0:
@@ -119,12 +119,12 @@ class MedifinderScheduler:
                         appointment_id=first_apt.get('appointmentId') or first_apt.get('id'),
                         booking_string=first_apt.get('bookingString')
                     )
-                    logger.info(f"{task_id} ✅ Automatycznie zarezerwowano wizytę")
+                    logger.info("%s ✅ Automatycznie zarezerwowano wizytę", task_id)
                 except Exception as e:
-                    logger.error(f"{task_id} ❌ Błąd auto-booking: {str(e)}")
+                    logger.error("%s ❌ Błąd auto-booking: %s", task_id, e)
             
         except Exception as e:
-            logger.error(f"{task_id} Błąd podczas wykonywania zadania: {str(e)}")
+            logger.error("%s Błąd podczas wykonywania zadania: %s", task_id, e)
             if task_id in self.task_status:
                 self.task_status[task_id]['last_error'] = {
                     'error': str(e),